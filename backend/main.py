@@ -14,47 +14,135 @@ Architecture:
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List
+from contextlib import asynccontextmanager
 import tempfile
 import os
-import asyncio
-import atexit
-from datetime import datetime
+import hashlib
+import time
+import orjson
 import uvicorn
 
-from services.rag_service import RAGService
-from models.chat_models import ChatRequest, ChatResponse, ConfigRequest, StatusResponse, DocumentResponse
+from services.rag_service import RAGService, FALLBACK_RESPONSE
+from services.chat_cache import ChatCache
+from models.chat_models import ChatRequest, ChatResponse, ConfigRequest, StatusResponse, DocumentResponse, UrlRequest, UrlBatchRequest
+
+def copy_and_hash(source, destination, length: int = 1 << 20) -> str:
+    """
+    Copie un fichier par blocs en calculant son empreinte BLAKE2b au passage.
+    
+    Returns:
+        str: Empreinte hexadécimale du contenu copié
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    while True:
+        chunk = source.read(length)
+        if not chunk:
+            break
+        digest.update(chunk)
+        destination.write(chunk)
+    return digest.hexdigest()
+
+# Instance globale du service RAG
+"""
+Service principal gérant la logique métier de l'application.
+Centralise les interactions avec les modèles, la base vectorielle et les APIs externes.
+"""
+rag_service = RAGService()
+
+# Cache des réponses pour les requêtes de chat identiques
+chat_cache = ChatCache(max_size=512, ttl=300)
+
+# Cache court des réponses Ollama interrogées périodiquement par le frontend
+ollama_cache = {}
+
+async def cached_call(key: str, ttl: float, fn):
+    """
+    Retourne le résultat de `fn()` mis en cache pendant `ttl` secondes.
+    
+    Args:
+        key: Clé du cache
+        ttl: Durée de validité en secondes
+        fn: Coroutine à appeler en cas d'absence ou d'expiration
+    """
+    now = time.monotonic()
+    entry = ollama_cache.get(key)
+    if entry and now - entry[0] < ttl:
+        return entry[1]
+    result = await fn()
+    ollama_cache[key] = (now, result)
+    return result
+
+async def invalidate_chat_caches():
+    """
+    Invalide les caches de réponses (exact et sémantique).
+    
+    Appelée dès que les documents indexés ou la configuration changent,
+    les réponses précédentes pouvant alors être obsolètes.
+    """
+    chat_cache.clear()
+    await rag_service.clear_semantic_cache()
+
+# Les URL volumineuses sont indexées en tâche de fond: invalider à la fin de l'indexation
+rag_service.on_documents_indexed = invalidate_chat_caches
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Gère le cycle de vie de l'application FastAPI.
+    
+    La fermeture des connexions et ressources est exécutée sur la boucle
+    d'événements active de uvicorn, avant son arrêt.
+    """
+    yield
+    await rag_service.cleanup()
 
 # Initialisation de l'application FastAPI
-app = FastAPI(title="Professeur Virtuel - RAG Assistant API", version="1.0.0")
+app = FastAPI(
+    title="Professeur Virtuel - RAG Assistant API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # Sérialisation JSON via orjson (C)
+)
 
 # Configuration CORS pour permettre les requêtes depuis le frontend React
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Serveur de développement React
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # Mise en cache des requêtes preflight pendant 24h
 )
 
-# Instance globale du service RAG
-"""
-Service principal gérant la logique métier de l'application.
-Centralise les interactions avec les modèles, la base vectorielle et les APIs externes.
-"""
-rag_service = RAGService()
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    Compression GZip, sauf pour les routes de diffusion SSE.
+    
+    Certaines versions de Starlette compressent aussi `text/event-stream`:
+    les petits événements restent alors dans le tampon gzip, ce qui annule
+    le gain de latence du premier token.
+    """
+    def __init__(self, app, excluded_paths=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.excluded_paths = frozenset(excluded_paths)
 
-# Fonction de nettoyage lors de l'arrêt de l'application
-"""
-Gère la fermeture propre des connexions et ressources
-lors de l'arrêt du serveur FastAPI.
-"""
-async def cleanup():
-    await rag_service.cleanup()
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
-# Enregistrement de la fonction de nettoyage
-atexit.register(lambda: asyncio.run(cleanup()))
+# Compression des réponses volumineuses (réponses de chat, sources), hors flux SSE
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    excluded_paths=("/api/chat/stream",),
+    minimum_size=1024,
+    compresslevel=5,
+)
 
 @app.get("/")
 async def root():
@@ -62,7 +150,7 @@ async def root():
     return {"message": "Professeur Virtuel - RAG Assistant API"}
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     """
     Traite les requêtes de chat avec support RAG ou mode simple.
     
@@ -71,6 +159,7 @@ async def chat(request: ChatRequest):
     
     Args:
         request: Objet ChatRequest contenant le message utilisateur et les paramètres
+        background_tasks: Tâches exécutées après l'envoi de la réponse
         
     Returns:
         ChatResponse: Réponse générée par le modèle avec contexte éventuel
@@ -79,17 +168,65 @@ async def chat(request: ChatRequest):
         HTTPException: En cas d'erreur de traitement ou de configuration invalide
     """
     try:
-        response = await rag_service.process_chat(request)
+        cache_key = chat_cache.make_key(request)
+        cached = chat_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Recherche d'une question proche déjà traitée (cache sémantique)
+        query_vector, cached = await rag_service.lookup_semantic_cache(request)
+        if cached is not None:
+            chat_cache.put(cache_key, cached)
+            return cached
+        
+        # Le vecteur de la recherche sémantique est réutilisé pour la recherche documentaire
+        response = await rag_service.process_chat(request, query_vector)
+        # La réponse de repli n'est jamais mise en cache: une nouvelle tentative doit regénérer
+        if response.response != FALLBACK_RESPONSE:
+            chat_cache.put(cache_key, response)
+            # Enregistrement dans le cache sémantique après l'envoi de la réponse
+            background_tasks.add_task(rag_service.store_semantic_cache, request, query_vector, response)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Traite une requête de chat en diffusant la réponse au fil de l'eau (SSE).
+    
+    Chaque fragment généré par le modèle est envoyé dans un événement
+    `data: {"delta": ...}`; le dernier événement contient la réponse
+    nettoyée complète, les sources et le type de recherche (`done: true`).
+    
+    Args:
+        request: Objet ChatRequest contenant le message utilisateur et les paramètres
+        
+    Returns:
+        StreamingResponse: Flux d'événements text/event-stream
+    """
+    async def event_stream():
+        try:
+            async for event in rag_service.stream_chat(request):
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            yield b"data: " + orjson.dumps({"error": f"Error processing chat: {str(e)}"}) + b"\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/upload-pdf", response_model=DocumentResponse)
 async def upload_pdf(file: UploadFile = File(...)):
     """
     Télécharge et traite un document PDF pour l'indexation RAG.
     
-    Extrait le contenu textuel du PDF, le segmente en chunks,
+    Le fichier est validé par sa signature (%PDF-) puis copié sur disque par
+    blocs de 1 Mo dans un thread, sans être chargé entièrement en mémoire.
+    Un fichier dont le contenu a déjà été indexé n'est pas retraité.
+    Extrait ensuite le contenu textuel du PDF, le segmente en chunks,
     génère les embeddings vectoriels et l'indexe dans Qdrant.
     
     Args:
@@ -101,17 +238,37 @@ async def upload_pdf(file: UploadFile = File(...)):
     Raises:
         HTTPException: Si le fichier n'est pas un PDF ou en cas d'erreur de traitement
     """
+    temp_path = None
     try:
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Seuls les fichiers PDF sont autorisés")
         
-        response = await rag_service.process_pdf(file)
+        # Validation par signature plutôt que par extension
+        if file.file.read(5) != b"%PDF-":
+            raise HTTPException(status_code=400, detail="Le fichier n'est pas un PDF valide")
+        file.file.seek(0)
+        
+        # Copie en streaming vers un fichier temporaire (mémoire constante),
+        # avec calcul de l'empreinte pour ignorer les PDF déjà indexés
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+            temp_path = tmp_file.name
+            content_hash = await run_in_threadpool(copy_and_hash, file.file, tmp_file)
+        
+        response = await rag_service.process_pdf(temp_path, file.filename, content_hash)
+        # PDF déjà indexé: aucun nouveau chunk, les réponses en cache restent valides
+        if response.chunks_added:
+            await invalidate_chat_caches()
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
 
 @app.post("/api/add-url", response_model=DocumentResponse)
-async def add_url(url: str, background_tasks: BackgroundTasks):
+async def add_url(body: UrlRequest, background_tasks: BackgroundTasks):
     """
     Ajoute et traite une URL web pour l'indexation RAG.
     
@@ -119,7 +276,7 @@ async def add_url(url: str, background_tasks: BackgroundTasks):
     puis l'indexe dans la base vectorielle pour les recherches futures.
     
     Args:
-        url: URL de la page web à traiter
+        body: Corps JSON contenant l'URL de la page web à traiter
         background_tasks: Gestionnaire de tâches asynchrones pour l'optimisation
         
     Returns:
@@ -129,13 +286,14 @@ async def add_url(url: str, background_tasks: BackgroundTasks):
         HTTPException: En cas d'erreur d'accès à l'URL ou de traitement
     """
     try:
-        response = await rag_service.process_url(url, background_tasks)
+        response = await rag_service.process_url(str(body.url), background_tasks)
+        await invalidate_chat_caches()
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/add-urls-batch", response_model=List[DocumentResponse])
-async def add_urls_batch(urls: List[str], background_tasks: BackgroundTasks):
+async def add_urls_batch(body: UrlBatchRequest, background_tasks: BackgroundTasks):
     """
     Traite plusieurs URLs en parallèle pour un indexation optimisée.
     
@@ -143,7 +301,7 @@ async def add_urls_batch(urls: List[str], background_tasks: BackgroundTasks):
     de la concurrence et agrégation des résultats.
     
     Args:
-        urls: Liste des URLs à traiter
+        body: Corps JSON contenant la liste des URLs à traiter
         background_tasks: Gestionnaire de tâches pour le traitement parallèle
         
     Returns:
@@ -153,7 +311,8 @@ async def add_urls_batch(urls: List[str], background_tasks: BackgroundTasks):
         HTTPException: En cas d'erreur lors du traitement batch
     """
     try:
-        responses = await rag_service.process_url_batch(urls, background_tasks)
+        responses = await rag_service.process_url_batch([str(url) for url in body.urls], background_tasks)
+        await invalidate_chat_caches()
         return responses
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -164,7 +323,8 @@ async def get_cache_stats():
     Récupère les statistiques du cache des URLs.
     
     Fournit des métriques sur l'utilisation du cache pour le monitoring
-    et l'optimisation des performances du système.
+    et l'optimisation des performances du système, y compris celles
+    du cache des réponses de chat.
     
     Returns:
         dict: Statistiques détaillées du cache (taille, hits, misses, etc.)
@@ -174,6 +334,7 @@ async def get_cache_stats():
     """
     try:
         stats = await rag_service.get_cache_stats()
+        stats["chat_cache"] = chat_cache.stats()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -206,6 +367,8 @@ async def update_config(config: ConfigRequest):
     """
     try:
         rag_service.update_config(config)
+        ollama_cache.clear()
+        await invalidate_chat_caches()
         return {"message": "Configuration mise à jour avec succès"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -236,7 +399,7 @@ async def get_ollama_models():
     Récupère la liste des modèles Ollama disponibles localement.
     
     Interroge le serveur Ollama local pour obtenir la liste des modèles
-    installés et disponibles pour l'utilisation.
+    installés et disponibles pour l'utilisation. Résultat mis en cache 5s.
     
     Returns:
         dict: Dictionnaire contenant la liste des modèles disponibles
@@ -245,7 +408,7 @@ async def get_ollama_models():
         HTTPException: En cas d'erreur de connexion à Ollama ou de récupération
     """
     try:
-        models = await rag_service.get_ollama_models()
+        models = await cached_call("models", 5.0, rag_service.get_ollama_models)
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -256,7 +419,7 @@ async def check_ollama_status():
     Vérifie si le serveur Ollama est en cours d'exécution.
     
     Teste la connectivité avec le serveur Ollama local pour déterminer
-    sa disponibilité pour le traitement des requêtes.
+    sa disponibilité pour le traitement des requêtes. Résultat mis en cache 2s.
     
     Returns:
         dict: Statut de fonctionnement d'Ollama (running: boolean)
@@ -265,7 +428,7 @@ async def check_ollama_status():
         HTTPException: En cas d'erreur lors de la vérification du statut
     """
     try:
-        is_running = await rag_service.check_ollama_connection()
+        is_running = await cached_call("status", 2.0, rag_service.check_ollama_connection)
         return {"running": is_running}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -295,7 +458,8 @@ async def clear_documents():
         HTTPException: En cas d'erreur lors de la suppression
     """
     try:
-        rag_service.clear_documents()
+        await rag_service.clear_documents()
+        await invalidate_chat_caches()
         return {"message": "Tous les documents ont été supprimés avec succès"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -343,6 +507,20 @@ async def delete_conversation_data(conversation_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Génération unique du schéma OpenAPI, une fois toutes les routes déclarées
+app.openapi_schema = app.openapi()
+
 if __name__ == "__main__":
     # Lancement du serveur FastAPI avec configuration de production
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Plusieurs workers (WEB_CONCURRENCY) nécessitent l'application sous forme
+    # de chaîne d'import; chaque worker possède alors son propre état en mémoire.
+    # loop/http restent à "auto": uvicorn choisit uvloop et httptools s'ils sont installés.
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    uvicorn.run(
+        "main:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        log_level="warning",
+        access_log=False,  # Pas de journalisation par requête
+    )
\ No newline at end of file
@@ -10,10 +10,11 @@ Classes principales:
 - ChatResponse: Structure des réponses générées
 - ConfigRequest: Paramètres de configuration système
 - StatusResponse: État des services connectés
+- UrlRequest / UrlBatchRequest: URLs à indexer
 """
 
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
+from typing import Any, Dict, List, Optional
 
 class ChatMessage(BaseModel):
     """
@@ -22,6 +23,8 @@ class ChatMessage(BaseModel):
     Structure de base pour stocker les échanges conversationnels
     avec identification du rôle (utilisateur/assistant).
     """
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+
     role: str  # "user" ou "assistant" 
     content: str  # Contenu textuel du message
 
@@ -33,6 +36,8 @@ class ChatRequest(BaseModel):
     utilisateur, incluant les options de recherche, le choix du modèle
     et les configurations de fournisseur.
     """
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+
     message: str  # Message de l'utilisateur à traiter
     rag_enabled: bool = True  # Activation du mode RAG pour recherche documentaire
     force_web_search: bool = False  # Forcer la recherche web même avec documents
@@ -42,6 +47,7 @@ class ChatRequest(BaseModel):
     openrouter_model: Optional[str] = None  # Modèle OpenRouter spécifique
     ollama_model: Optional[str] = None  # Modèle Ollama spécifique
     provider: str = "ollama"  # Fournisseur: "openrouter" ou "ollama"
+    include_previews: bool = True  # Extraits de contenu dans les sources (clients sans affichage: False)
 
 class ChatResponse(BaseModel):
     """
@@ -50,9 +56,11 @@ class ChatResponse(BaseModel):
     Contient la réponse textuelle ainsi que les métadonnées
     sur les sources utilisées et le processus de raisonnement.
     """
+    model_config = ConfigDict(validate_assignment=False)
+
     response: str  # Réponse générée par le modèle
-    sources: Optional[List[dict]] = None  # Sources documentaires utilisées
-    thinking_process: Optional[str] = None  # Processus de raisonnement visible
+    sources: List[Dict[str, Any]] = Field(default_factory=list)  # Sources documentaires utilisées
+    thinking_process: str = ""  # Processus de raisonnement visible
     search_type: Optional[str] = None  # Type de recherche: "document", "web", "none"
 
 class ConfigRequest(BaseModel):
@@ -62,6 +70,8 @@ class ConfigRequest(BaseModel):
     Permet la mise à jour dynamique des clés API, URLs de services,
     et paramètres de fonctionnement sans redémarrage.
     """
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+
     qdrant_api_key: Optional[str] = None  # Clé API pour base vectorielle Qdrant
     qdrant_url: Optional[str] = None  # URL du cluster Qdrant
     model_version: Optional[str] = None  # Version du modèle par défaut
@@ -79,6 +89,8 @@ class StatusResponse(BaseModel):
     Fournit un diagnostic complet de la connectivité
     avec tous les services utilisés par l'application.
     """
+    model_config = ConfigDict(validate_assignment=False)
+
     ollama_status: str  # État du serveur Ollama local
     qdrant_status: str  # État de la base vectorielle Qdrant
     web_search_status: str  # État du service de recherche web
@@ -92,6 +104,27 @@ class DocumentResponse(BaseModel):
     Confirme l'indexation réussie d'un document avec métadonnées
     sur le nombre de segments créés et le fichier traité.
     """
+    model_config = ConfigDict(validate_assignment=False)
+
     message: str  # Message de confirmation du traitement
     filename: str  # Nom du fichier traité
-    chunks_added: int  # Nombre de segments indexés
\ No newline at end of file
+    chunks_added: int  # Nombre de segments indexés
+
+class UrlRequest(BaseModel):
+    """
+    Paramètres d'ajout d'une URL web à indexer.
+    
+    L'URL est validée par Pydantic avant tout traitement,
+    ce qui rejette les adresses malformées dès la réception.
+    """
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+
+    url: HttpUrl  # URL de la page web à traiter
+
+class UrlBatchRequest(BaseModel):
+    """
+    Paramètres d'ajout de plusieurs URLs web à indexer.
+    """
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+
+    urls: List[HttpUrl]  # URLs des pages web à traiter
\ No newline at end of file
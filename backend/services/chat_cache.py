@@ -0,0 +1,27 @@
+"""
+Cache des réponses de chat (LRU + TTL)
+
+ChatCache: réponses de l'endpoint /api/chat pour les requêtes strictement
+identiques (renvoi, nouvelle tentative, double clic). Évite de relancer
+tout le pipeline RAG et l'appel au modèle sur un doublon.
+"""
+
+import hashlib
+import json
+
+from models.chat_models import ChatRequest
+from services.cache import LRUCache
+
+
+class ChatCache(LRUCache):
+    """
+    Cache des réponses de chat.
+
+    Les entrées sont indexées par une empreinte BLAKE2b de la requête complète.
+    """
+
+    @staticmethod
+    def make_key(request: ChatRequest) -> str:
+        """Construit une clé de cache stable à partir de tous les paramètres de la requête."""
+        payload = json.dumps(request.model_dump(), sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
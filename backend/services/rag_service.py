@@ -14,17 +14,30 @@ Fonctionnalités principales:
 - Recherche web de secours via DuckDuckGo
 """
 
-import tempfile
-import os
 import re
 import asyncio
 import hashlib
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+import uuid
+import orjson
+import heapq
+import time
+import functools
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Dict, Any, AsyncIterator, Awaitable, Callable
 import bs4
-from fastapi import UploadFile, BackgroundTasks
+import lxml.html
+from urllib.parse import parse_qs, urlparse
+from fastapi import BackgroundTasks
 import httpx
-import subprocess
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 from agno.agent import Agent
 from agno.models.ollama import Ollama
@@ -32,7 +45,14 @@ from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+    Range, FilterSelector, PayloadSchemaType,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig,
+    SearchParams, QuantizationSearchParams,
+    HnswConfigDiff, OptimizersConfigDiff,
+)
 from langchain_core.embeddings import Embeddings
 from agno.embedder.ollama import OllamaEmbedder
 from duckduckgo_search import DDGS
@@ -40,6 +60,144 @@ import requests
 import trafilatura
 
 from models.chat_models import ChatRequest, ChatResponse, ConfigRequest, StatusResponse, DocumentResponse
+from services.cache import LRUCache
+
+# "Professeur Virtuel" system prompt shared by every provider
+_SYSTEM_PROMPT = """You are "Professeur Virtuel" - an AI assistant for researchers, PhD students, engineers, R&D teams, and enterprise management services.
+
+ABSOLUTE CRITICAL RULE: Your response must contain ONLY the final answer to the user's question. You must NEVER include:
+- Any analysis, reasoning, or thinking process
+- Phrases like "Let me analyze", "Based on my analysis", "I need to", "Let's", "I'll"
+- Meta-commentary about your approach or process
+- Planning steps or internal thoughts
+- System-level explanations or reasoning
+- Words like "analysis", "reasoning", "thinking", "planning" followed by your thought process
+
+WRONG EXAMPLES (NEVER do this):
+- "analysisWe need to give a structured answer... Ok proceed."
+- "Let me analyze this question first..."
+- "Based on my analysis of the context..."
+- "I need to examine the documents..."
+
+RIGHT APPROACH: Start immediately with your substantive answer to the user's question.
+
+Your mission is to provide **structured**, **clear**, and **rigorous** answers while adapting your tone to your audience:
+- **Academic tone** for researchers and PhD students
+- **Technical tone** for engineers and R&D teams  
+- **Strategic tone** for enterprise management
+
+## Core Principles:
+1. **Structure & Clarity**: Use formatting effectively
+   - **Bold** for key terms and concepts
+   - Bullet points for lists and options
+   - Numbered lists for step-by-step processes
+   - Tables when comparing data or options
+
+2. **Source Attribution**: When using provided context
+   - **Cite the source document or filename** when available
+   - Reference specific sections when possible
+   - Distinguish between document-based and general knowledge
+
+3. **Clean Output**: 
+   - Provide direct, user-facing answers
+   - No meta-commentary about your process
+   - No analysis explanations unless explicitly requested
+   - Professional and polished responses only
+
+## Response Guidelines:
+- When given **context from documents**: Focus on the provided information, cite sources
+- When given **web search results**: Synthesize information and list sources at the end
+- When using **general knowledge**: Be clear about the knowledge source
+- Always maintain **professional clarity** and **directness**"""
+
+# Request headers for bodies pre-encoded with orjson
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Trafilatura settings built once instead of on every extraction
+_TRAFILATURA_CFG = trafilatura.settings.use_config()
+_TRAFILATURA_CFG.set("DEFAULT", "MIN_EXTRACTED_SIZE", "200")
+
+# Above this HTML size, skip the slow precision-oriented pruning pass
+_PRECISION_MAX_HTML_SIZE = 500_000
+
+# Collapses blank lines and whitespace around line breaks in one pass
+_LINE_BREAKS_RE = re.compile(r'[ \t]*\n\s*')
+
+# Only build the <body> subtree when parsing fallback HTML (skips <head>, its scripts and styles)
+_BODY_STRAINER = bs4.SoupStrainer("body")
+
+# DuckDuckGo HTML results: organic result blocks (ads excluded)
+_DDG_RESULT_XPATH = (
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' result ')"
+    " and not(contains(@class, 'result--ad'))]"
+)
+
+
+def _parse_ddg_html(html: bytes, max_results: int) -> List[Dict[str, str]]:
+    """Extract {title, href, body} results from a DuckDuckGo HTML page."""
+    results = []
+    for node in lxml.html.fromstring(html).xpath(_DDG_RESULT_XPATH):
+        links = node.xpath(".//a[contains(@class, 'result__a')]")
+        if not links:
+            continue
+        href = links[0].get("href", "")
+        # Result links go through a redirect carrying the target in 'uddg'
+        if "uddg=" in href:
+            href = parse_qs(urlparse(href).query).get("uddg", [href])[0]
+        snippets = node.xpath(".//*[contains(@class, 'result__snippet')]")
+        results.append({
+            "title": links[0].text_content().strip(),
+            "href": href,
+            "body": snippets[0].text_content().strip() if snippets else ""
+        })
+        if len(results) >= max_results:
+            break
+    return results
+
+
+# Length of the content excerpt attached to each source
+_PREVIEW_CHARS = 200
+
+
+def _preview(text: str) -> str:
+    """Source excerpt: short texts are returned as-is, without a copy."""
+    return text if len(text) <= _PREVIEW_CHARS else text[:_PREVIEW_CHARS] + "..."
+
+
+# Answer returned when cleanup leaves nothing usable; it is never cached
+FALLBACK_RESPONSE = "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
+
+
+# Response cleanup: every unanchored removal pattern fused into one
+# alternation so a reply is scanned once instead of once per pattern
+_CLEANUP_PATTERNS = [
+    # Thinking tags that might leak through
+    r'(?s:<think>.*?</think>)',
+    # Reasoning concatenated to the answer without spaces ("analysisWe need...proceed"),
+    # as produced by models like gpt-oss-20b
+    r'(?s:(?:analysis|reasoning|planning|thinking|assistant|system|let\'s)[A-Z][^.]*?(?:proceed|continue|final|answer|respond))',
+    # Meta-commentary
+    r'(?:I need to|Let me|Let\'s|I\'ll|I will|I should|Based on my analysis|Upon reviewing'
+    r'|According to my analysis|After analyzing|From my analysis|My analysis shows'
+    r'|The analysis indicates|Now I|First, I|To answer this|Looking at|Examining).*?\.(?=\s|$)',
+    # System role indicators
+    r'(?:assistant|system|ai|bot|model):?\s*',
+    # Internal commands
+    r'(?:ok proceed|proceed|continue)\.*',
+    r'(?:final|answer|respond)\.*$',
+]
+_CLEANUP_RE = re.compile('|'.join(_CLEANUP_PATTERNS), re.IGNORECASE)
+
+# Reasoning left at the beginning of the response (no capital letter), or a
+# standalone reasoning word
+_LEADING_REASONING_RE = re.compile(
+    r'^\s*(?:(?:analysis|reasoning|planning|thinking|assistant|let\'s)[a-z][^.]*?(?:proceed|continue|final|answer|respond)'
+    r'|(?:analysis|reasoning|planning|thinking|assistant|system|let\'s)\s*)',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Leading/trailing whitespace of every line, blank lines included
+_LINE_WHITESPACE_RE = re.compile(r'^\s+|[ \t]+$', re.MULTILINE)
 
 # Classe d'embeddings Ollama personnalisée
 class OllamaEmbedderr(Embeddings):
@@ -49,6 +207,15 @@ class OllamaEmbedderr(Embeddings):
     Fournit une interface compatible LangChain pour générer
     des représentations vectorielles via des modèles Ollama.
     """
+    # Local Ollama HTTP API: batch (/api/embed) and single-text (/api/embeddings) endpoints
+    base_url = "http://localhost:11434"
+    embed_url = f"{base_url}/api/embed"
+    embeddings_url = f"{base_url}/api/embeddings"
+    # Number of texts sent per request
+    batch_size = 64
+    # Maximum number of embedding requests in flight for the async path
+    max_concurrency = 8
+
     def __init__(self, model_name="snowflake-arctic-embed"):
         """
         Initialize the OllamaEmbedderr with a specific model.
@@ -56,21 +223,159 @@ class OllamaEmbedderr(Embeddings):
         Args:
             model_name (str): The name of the model to use for embedding.
         """
+        self.model_name = model_name
         self.embedder = OllamaEmbedder(id=model_name, dimensions=1024)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get or create the pooled client used by the async path."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(120.0))
+        return self._client
+
+    async def aclose(self):
+        """Close the pooled async client."""
+        if self._client:
+            await self._client.aclose()
+            self._client = None
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return [self.embed_query(text) for text in texts]
+        """Embed texts in batches with one Ollama request per batch."""
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            try:
+                response = requests.post(
+                    self.embed_url,
+                    data=orjson.dumps({"model": self.model_name, "input": batch}),
+                    headers=_JSON_HEADERS,
+                    timeout=120
+                )
+                response.raise_for_status()
+                vectors = orjson.loads(response.content)["embeddings"]
+                if len(vectors) != len(batch):
+                    raise ValueError("Embedding count mismatch")
+                embeddings.extend(vectors)
+            except Exception as e:
+                # Older Ollama versions lack /api/embed: embed one text at a time
+                print(f"Batch embedding failed, falling back to per-text embedding: {e}")
+                embeddings.extend(self.embed_query(text) for text in batch)
+        return embeddings
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts asynchronously, sending the batches concurrently."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        client = self._get_client()
+
+        async def embed_single(text: str) -> List[float]:
+            async with semaphore:
+                response = await client.post(
+                    self.embeddings_url,
+                    content=orjson.dumps({"model": self.model_name, "prompt": text}),
+                    headers=_JSON_HEADERS
+                )
+                response.raise_for_status()
+                return orjson.loads(response.content)["embedding"]
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            try:
+                async with semaphore:
+                    response = await client.post(
+                        self.embed_url,
+                        content=orjson.dumps({"model": self.model_name, "input": batch}),
+                        headers=_JSON_HEADERS
+                    )
+                    response.raise_for_status()
+                    vectors = orjson.loads(response.content)["embeddings"]
+                if len(vectors) != len(batch):
+                    raise ValueError("Embedding count mismatch")
+                return vectors
+            except Exception as e:
+                print(f"Batch embedding failed, falling back to per-text embedding: {e}")
+                return list(await asyncio.gather(*(embed_single(text) for text in batch)))
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
 
     def embed_query(self, text: str) -> List[float]:
         return self.embedder.get_embedding(text)
 
 
+class _BatchingEmbedder(Embeddings):
+    """
+    Regroupe les embeddings de requêtes concurrentes.
+
+    Les appels à `embed_query` déjà en attente pendant qu'un lot est
+    calculé (jusqu'à `batch_size` requêtes) sont envoyés à Ollama en un
+    seul appel `embed_documents`. Une requête isolée part immédiatement,
+    sans délai d'attente. La recherche de similarité reste par requête.
+    """
+    def __init__(self, embedder: Embeddings, batch_size: int = 16):
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="query-embedder", daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedder.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedder.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queue a query and block until its batch has been embedded."""
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect(self) -> List[tuple]:
+        """Block for one query, then take only those already queued."""
+        items = [self._queue.get()]
+        while len(items) < self.batch_size:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                vectors = self.embedder.embed_documents([text for text, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(items, vectors):
+                future.set_result(vector)
+
+
 class RAGService:
+    # Default (api_key, url) values: Qdrant is not configured until they are replaced
+    _QDRANT_PLACEHOLDERS = ("YOUR_API_HERE", "qdrant_URL")
+
+    # Dimension of the snowflake-arctic-embed embeddings stored in the collection
+    _VECTOR_SIZE = 1024
+
+    # Text splitters shared by every document (built once)
+    _PDF_SPLITTER = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    _WEB_SPLITTER = RecursiveCharacterTextSplitter(
+        chunk_size=1200,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
     def __init__(self):
         self.collection_name = "test-deepseek-r1"
         self.config = {
-            'qdrant_api_key': "YOUR_API_HERE",
-            'qdrant_url': "qdrant_URL",
+            'qdrant_api_key': self._QDRANT_PLACEHOLDERS[0],
+            'qdrant_url': self._QDRANT_PLACEHOLDERS[1],
             'model_version': "deepseek-r1:1.5b",
             'similarity_threshold': 0.7,
             'use_web_search': False,
@@ -78,20 +383,74 @@ class RAGService:
             'openrouter_model': None,
             'ollama_model': None,
             'provider': 'ollama',
+            # Qdrant collection storage settings (applied when the collection is created)
+            'on_disk_payload': True,
+            # Original vectors memory-mapped; quantized copies stay in RAM for search
+            'vectors_on_disk': True,
+            # Segment size in KB (not vectors) above which the HNSW index is built
+            'indexing_threshold_kb': 20000,
+            'hnsw_m': 16,
+            'hnsw_ef_construct': 100,
+            # Batched point upload when indexing documents
+            'upload_batch_size': 256,
+            # 1-bit vectors (32x smaller than fp32); rescoring restores recall
+            'binary_quantization': True,
+            # Top document score tiers: above high, skip web search; below low,
+            # prefer web results when web search is enabled
+            'high_confidence_score': 0.82,
+            'low_confidence_score': 0.55,
         }
         self.vector_store = None
-        self.processed_documents = []
-        self.chat_history = []
+        self.embeddings = OllamaEmbedderr()
+        # Query embeddings from concurrent chats share one Ollama round-trip
+        self.query_embeddings = _BatchingEmbedder(self.embeddings)
+        self._processed_set: set = set()  # O(1) duplicate check, every indexed name
+        self._processed_deque: deque = deque(maxlen=1000)  # Most recent names, for display
+        self.seen_pdf_hashes: set = set()  # Content hashes of indexed PDFs
+        self._chunk_hashes: set = set()  # BLAKE2b digests of indexed chunk texts
+        self.chat_history: deque = deque(maxlen=200)  # Last 100 exchanges
         self.qdrant_client = None
         
         # URL caching and processing optimization
-        self.url_cache: Dict[str, Dict[str, Any]] = {}
+        self.url_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # LRU order
+        self._url_cache_expiry: List[tuple] = []  # Min-heap of (expiry_ts, cache_key)
+        self.content_cache: "OrderedDict[str, List[str]]" = OrderedDict()  # SHA-256 of page text -> chunk texts
         self.cache_expiry_hours = 24  # Cache for 24 hours
         self.max_cache_size = 100  # Maximum cached URLs
         self.processing_queue: Dict[str, asyncio.Future] = {}  # Track ongoing processing
+        self.url_batch_concurrency = 8  # Maximum concurrent downloads per batch
+        # Service-wide back-pressure across batches: page downloads and chunk indexing
+        self._fetch_sem = asyncio.Semaphore(5)
+        self._embed_sem = asyncio.Semaphore(2)
         
         # HTTP client for async requests
         self.http_client = None
+        # Keep-alive client pinned to DuckDuckGo's HTML endpoint
+        self._ddg_client = None
+        
+        # Dedicated pool for blocking embedding/Qdrant calls, so vector work
+        # does not starve the default executor used by sync route handlers
+        self._io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-io")
+
+
+        # Vector search results keyed by query and search settings
+        self.query_cache = LRUCache(max_size=2000, ttl=300)
+        # Gathered chat context (context, sources, search_type), web results included
+        self.context_cache = LRUCache(max_size=256, ttl=300)
+        # Ollama/Qdrant liveness probe results for get_status
+        self.status_cache = LRUCache(max_size=8, ttl=10)
+
+        # Semantic cache of chat answers (query embedding -> response)
+        self.semantic_cache_collection = "chat_semantic_cache"
+        self.semantic_cache_margin = 0.1  # Added to the request similarity threshold
+        self.semantic_cache_min_score = 0.92  # Never serve a cached answer below this similarity
+        self.semantic_cache_ttl = 3600  # Seconds a cached answer stays servable
+        self.semantic_cache_max_entries = 5000
+        self.semantic_cache_retry_delay = 30.0  # Seconds to skip the cache after a Qdrant failure
+        self._semantic_cache_ready = False
+        self._semantic_cache_retry_at = 0.0
+        # Awaited after background indexing completes (set by the API to drop answer caches)
+        self.on_documents_indexed: Optional[Callable[[], Awaitable[None]]] = None
 
     def update_config(self, config: ConfigRequest):
         """Update service configuration"""
@@ -117,72 +476,85 @@ class RAGService:
         # Reinitialize Qdrant client if credentials changed
         if config.qdrant_api_key or config.qdrant_url:
             self.qdrant_client = None
+            self._semantic_cache_ready = False
+            self.status_cache.clear()
 
     async def _get_http_client(self) -> httpx.AsyncClient:
         """Get or create async HTTP client."""
         if self.http_client is None:
             self.http_client = httpx.AsyncClient(
                 timeout=httpx.Timeout(30.0),
-                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                # Multiplex requests to the same host when h2 is installed
+                http2=HTTP2_AVAILABLE,
                 headers={
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                 }
             )
         return self.http_client
 
+    async def _run_io(self, func, *args, **kwargs):
+        """Run a blocking embedding/Qdrant call on the dedicated I/O executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, functools.partial(func, *args, **kwargs))
+
+    def _get_query_cache_key(self, query: str, threshold: float, k: int) -> str:
+        """Generate vector search cache key for a query and its search settings."""
+        raw = f"{self.collection_name}|{k}|{threshold}|{query}"
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    def _get_context_cache_key(self, request: ChatRequest) -> str:
+        """Generate context cache key from the normalized question and search options."""
+        query = " ".join(request.message.lower().split())
+        raw = (
+            f"{request.similarity_threshold}|{request.rag_enabled}|"
+            f"{request.use_web_search}|{request.force_web_search}|"
+            f"{request.include_previews}|{query}"
+        )
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
     def _get_url_cache_key(self, url: str) -> str:
         """Generate cache key for URL."""
-        return hashlib.md5(url.encode()).hexdigest()
+        return hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
 
     def _is_cache_valid(self, cache_entry: Dict[str, Any]) -> bool:
         """Check if cache entry is still valid."""
-        if 'timestamp' not in cache_entry:
-            return False
-        
-        cache_time = datetime.fromisoformat(cache_entry['timestamp'])
-        expiry_time = cache_time + timedelta(hours=self.cache_expiry_hours)
-        return datetime.now() < expiry_time
+        return time.time() < cache_entry.get('expires_at', 0.0)
 
     def _cleanup_cache(self):
         """Remove expired and excess cache entries."""
-        # Remove expired entries
-        expired_keys = []
-        for key, entry in self.url_cache.items():
-            if not self._is_cache_valid(entry):
-                expired_keys.append(key)
+        # Remove expired entries, soonest expiry first
+        now = time.time()
+        while self._url_cache_expiry and self._url_cache_expiry[0][0] <= now:
+            _, key = heapq.heappop(self._url_cache_expiry)
+            entry = self.url_cache.get(key)
+            if entry is not None and not self._is_cache_valid(entry):
+                del self.url_cache[key]
         
-        for key in expired_keys:
-            del self.url_cache[key]
-        
-        # Remove oldest entries if cache is too large
-        if len(self.url_cache) > self.max_cache_size:
-            # Sort by timestamp and keep only the newest entries
-            sorted_entries = sorted(
-                self.url_cache.items(),
-                key=lambda x: x[1].get('timestamp', ''),
-                reverse=True
-            )
-            self.url_cache = dict(sorted_entries[:self.max_cache_size])
+        # Remove least recently used entries if cache is too large
+        while len(self.url_cache) > self.max_cache_size:
+            self.url_cache.popitem(last=False)
 
     async def _fetch_url_content_async(self, url: str) -> str:
-        """Fetch URL content asynchronously with multiple fallback methods."""
+        """Fetch URL content asynchronously with multiple extraction fallbacks."""
         client = await self._get_http_client()
         content = None
         
+        # Single fetch shared by every extraction method
+        response = await client.get(url, follow_redirects=True)
+        response.raise_for_status()
+        
         try:
-            # Method 1: Direct fetch with trafilatura extraction
-            response = await client.get(url, follow_redirects=True)
-            response.raise_for_status()
-            
-            # Use trafilatura for fast, clean text extraction
+            # Method 1: trafilatura extraction
+            html = response.text
             content = trafilatura.extract(
-                response.text,
+                html,
                 include_comments=False,
                 include_tables=True,  # Keep tables for better content
-                favor_precision=True,
+                favor_precision=len(html) <= _PRECISION_MAX_HTML_SIZE,
                 include_formatting=False,
                 deduplicate=True,
-                config=trafilatura.settings.use_config()
+                config=_TRAFILATURA_CFG
             )
             
             if content and len(content.strip()) > 10:
@@ -192,21 +564,21 @@ class RAGService:
             print(f"Trafilatura extraction failed for {url}: {e}")
         
         try:
-            # Method 2: BeautifulSoup fallback
-            if not content:
-                response = await client.get(url, follow_redirects=True)
-                response.raise_for_status()
-                
-                soup = bs4.BeautifulSoup(response.text, 'html.parser')
-                
-                # Remove unwanted elements
-                for element in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-                    element.decompose()
-                
-                # Extract text with better formatting
-                text = soup.get_text(separator="\n", strip=True)
-                lines = [line.strip() for line in text.splitlines() if line.strip()]
-                content = "\n".join(lines)
+            # Method 2: BeautifulSoup fallback on the same response body
+            # lxml (C) parses raw bytes; reuse the declared charset when present
+            soup = bs4.BeautifulSoup(
+                response.content, 'lxml',
+                from_encoding=response.charset_encoding,
+                parse_only=_BODY_STRAINER
+            )
+            
+            # Remove unwanted elements
+            for element in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
+                element.decompose()
+            
+            # Extract text with better formatting
+            text = soup.get_text(separator="\n", strip=True)
+            content = _LINE_BREAKS_RE.sub("\n", text).strip()
                 
         except Exception as e:
             print(f"BeautifulSoup extraction failed for {url}: {e}")
@@ -229,57 +601,56 @@ class RAGService:
                 raise Exception(f"Qdrant connection failed: {str(e)}")
         return self.qdrant_client
 
+    # Local Ollama HTTP API
+    ollama_base_url = "http://localhost:11434"
+
     async def get_ollama_models(self) -> List[str]:
         """Get available Ollama models from the local Ollama instance."""
         try:
-            import subprocess
-            import json
-            
-            # Use ollama list command to get available models
-            result = subprocess.run(['ollama', 'list'], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Ollama command failed: {result.stderr}")
-                return []
-            
-            # Parse the output
-            lines = result.stdout.strip().split('\n')
-            models = []
-            
-            # Skip header line
-            for line in lines[1:]:
-                if line.strip():
-                    # Extract model name (first column)
-                    parts = line.split()
-                    if parts:
-                        model_name = parts[0]
-                        # Clean up model name (remove tags like :latest)
-                        if ':' in model_name:
-                            model_name = model_name.split(':')[0]
-                        models.append(model_name)
+            client = await self._get_http_client()
+            response = await client.get(f"{self.ollama_base_url}/api/tags", timeout=httpx.Timeout(10.0))
+            response.raise_for_status()
             
-            return list(set(models))  # Remove duplicates
-        except FileNotFoundError:
-            print("Ollama not found. Please ensure Ollama is installed and in PATH.")
+            # Clean up model names (remove tags like :latest) and duplicates
+            models = {m["name"].split(":")[0] for m in orjson.loads(response.content).get("models", [])}
+            return list(models)
+        except httpx.ConnectError:
+            print("Ollama not reachable. Please ensure Ollama is running on localhost:11434.")
             return []
-        except subprocess.TimeoutExpired:
-            print("Ollama command timed out")
+        except httpx.TimeoutException:
+            print("Ollama request timed out")
             return []
         except Exception as e:
             print(f"Error getting Ollama models: {e}")
             return []
 
-    async def check_ollama_connection(self) -> bool:
+    async def check_ollama_connection(self, timeout: float = 2.0) -> bool:
         """Check if Ollama is running and accessible."""
         try:
-            import subprocess
-            result = subprocess.run(['ollama', 'list'], capture_output=True, text=True, timeout=5)
-            return result.returncode == 0
+            client = await self._get_http_client()
+            response = await client.get(f"{self.ollama_base_url}/api/tags", timeout=httpx.Timeout(timeout))
+            return response.status_code == 200
         except Exception:
             return False
 
-    def _create_vector_store(self, texts):
-        """Create and initialize vector store with documents."""
+    def _quantization_config(self):
+        """Binary quantization when enabled and dimensions allow it, int8 otherwise."""
+        # Below ~384 dimensions binarization loses too much signal
+        if self.config.get('binary_quantization') and self._VECTOR_SIZE >= 384:
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=True)
+            )
+        # int8 vectors kept in RAM: 4x smaller, faster scans
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+
+    def _create_vector_store(self):
+        """Create the collection if needed and initialize the vector store."""
         client = self._init_qdrant()
         if not client:
             raise Exception("Qdrant client not initialized")
@@ -290,53 +661,252 @@ class RAGService:
                 client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
-                        size=1024,
-                        distance=Distance.COSINE
-                    )
+                        size=self._VECTOR_SIZE,
+                        distance=Distance.COSINE,
+                        on_disk=self.config['vectors_on_disk']
+                    ),
+                    # Payloads and original vectors on disk, HNSW graph in RAM
+                    on_disk_payload=self.config['on_disk_payload'],
+                    optimizers_config=OptimizersConfigDiff(
+                        indexing_threshold=self.config['indexing_threshold_kb']
+                    ),
+                    hnsw_config=HnswConfigDiff(
+                        m=self.config['hnsw_m'],
+                        ef_construct=self.config['hnsw_ef_construct'],
+                        on_disk=False
+                    ),
+                    quantization_config=self._quantization_config()
                 )
             except Exception as e:
                 if "already exists" not in str(e).lower():
                     raise e
 
             # Initialize vector store
-            vector_store = QdrantVectorStore(
+            return QdrantVectorStore(
                 client=client,
                 collection_name=self.collection_name,
-                embedding=OllamaEmbedderr()
+                embedding=self.query_embeddings
             )
 
-            # Add documents
-            vector_store.add_documents(texts)
-            return vector_store
-
         except Exception as e:
             raise Exception(f"Vector store error: {str(e)}")
 
-    def _process_pdf_content(self, file: UploadFile) -> List:
-        """Process PDF file and add source metadata."""
+    def _upload_documents(self, texts: List, vectors: List[List[float]]):
+        """Upload embedded chunks with Qdrant's batched point upload."""
+        client = self._init_qdrant()
+        if not client:
+            raise Exception("Qdrant client not initialized")
+
+        # Same payload layout as QdrantVectorStore so retrieval reads these points
+        points = [
+            PointStruct(
+                id=uuid.uuid4().hex,
+                vector=vector,
+                payload={"page_content": doc.page_content, "metadata": doc.metadata}
+            )
+            for doc, vector in zip(texts, vectors)
+        ]
+        client.upload_points(
+            collection_name=self.collection_name,
+            points=points,
+            batch_size=self.config['upload_batch_size'],
+            # In-process upload: a worker pool started from the server would
+            # re-import the app in every worker (spawn/forkserver)
+            parallel=1,
+            wait=True
+        )
+
+    def _dedupe_chunks(self, texts: List):
+        """Drop chunks whose text is already indexed or repeated in this batch.
+
+        Returns:
+            tuple: (unique chunks, their digests)
+        """
+        unique, digests = [], set()
+        for doc in texts:
+            digest = hashlib.blake2b(doc.page_content.encode(), digest_size=16).digest()
+            if digest in self._chunk_hashes or digest in digests:
+                continue
+            digests.add(digest)
+            unique.append(doc)
+        return unique, digests
+
+    async def _add_documents(self, texts: List) -> int:
+        """Add new chunks to the vector store, creating it on first use.
+
+        Returns the number of chunks actually embedded and uploaded.
+        """
+        # Embedding dominates indexing cost: skip chunks already in the collection
+        texts, digests = self._dedupe_chunks(texts)
+        if not texts:
+            return 0
+        if not self.vector_store:
+            self.vector_store = await self._run_io(self._create_vector_store)
+        # Embedding batches are sent to Ollama concurrently; few documents at a time
+        async with self._embed_sem:
+            vectors = await self.embeddings.aembed_documents([doc.page_content for doc in texts])
+            await self._run_io(self._upload_documents, texts, vectors)
+        self._chunk_hashes.update(digests)
+        self.query_cache.clear()
+        self.context_cache.clear()
+        return len(texts)
+
+    def _ensure_semantic_cache_collection(self, client: QdrantClient):
+        """Create the semantic cache collection on first use."""
+        if self._semantic_cache_ready:
+            return
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                content = file.file.read()
-                tmp_file.write(content)
-                tmp_file.flush()
-                temp_path = tmp_file.name
-            # At this point, tmp_file is closed
-            loader = PyPDFLoader(temp_path)
+            client.create_collection(
+                collection_name=self.semantic_cache_collection,
+                vectors_config=VectorParams(
+                    size=self._VECTOR_SIZE,
+                    distance=Distance.COSINE
+                )
+            )
+            # Filter and expiry fields are indexed
+            client.create_payload_index(
+                collection_name=self.semantic_cache_collection,
+                field_name="partition",
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+            client.create_payload_index(
+                collection_name=self.semantic_cache_collection,
+                field_name="created_at",
+                field_schema=PayloadSchemaType.FLOAT
+            )
+        except Exception as e:
+            if "already exists" not in str(e).lower():
+                raise e
+        self._semantic_cache_ready = True
+
+    def _semantic_cache_partition(self, request: ChatRequest) -> str:
+        """Partition key so answers from different models or modes never mix.
+
+        include_previews is part of it: a hit must carry the same source
+        excerpts (or lack of them) as a freshly generated answer.
+        """
+        model = request.openrouter_model if request.provider == 'openrouter' else request.ollama_model
+        return "|".join([
+            request.provider,
+            model or request.model_version,
+            str(request.rag_enabled),
+            str(request.use_web_search),
+            str(request.force_web_search),
+            str(request.include_previews),
+        ])
+
+    def _qdrant_configured(self) -> bool:
+        """Whether real Qdrant credentials replaced the placeholders."""
+        configured = (
+            self.config['qdrant_api_key'] and self.config['qdrant_url']
+            and (self.config['qdrant_api_key'], self.config['qdrant_url']) != self._QDRANT_PLACEHOLDERS
+        )
+        return bool(configured)
+
+    def _semantic_cache_available(self) -> bool:
+        """Whether Qdrant is configured and was not just found unreachable."""
+        return self._qdrant_configured() and time.monotonic() >= self._semantic_cache_retry_at
+
+    def _semantic_cache_failed(self, action: str, error: Exception):
+        """Log a semantic cache failure and skip the cache for a while."""
+        print(f"Semantic cache {action} failed: {error}")
+        self._semantic_cache_retry_at = time.monotonic() + self.semantic_cache_retry_delay
+
+    def _lookup_semantic_cache_sync(self, request: ChatRequest):
+        """Embed the message and look for a close enough cached answer."""
+        client = self._init_qdrant()
+        if not client:
+            return None, None
+        self._ensure_semantic_cache_collection(client)
+
+        vector = self.query_embeddings.embed_query(request.message)
+        hits = client.query_points(
+            collection_name=self.semantic_cache_collection,
+            query=vector,
+            query_filter=Filter(must=[
+                FieldCondition(key="partition", match=MatchValue(value=self._semantic_cache_partition(request))),
+                FieldCondition(key="created_at", range=Range(gte=time.time() - self.semantic_cache_ttl))
+            ]),
+            limit=1,
+            with_payload=True
+        ).points
+
+        # A low retrieval threshold must not turn loosely related questions into hits
+        min_score = max(self.semantic_cache_min_score, request.similarity_threshold + self.semantic_cache_margin)
+        if hits and hits[0].score >= min_score:
+            return vector, ChatResponse(**hits[0].payload["response"])
+        return vector, None
+
+    async def lookup_semantic_cache(self, request: ChatRequest):
+        """Return (query_vector, cached ChatResponse or None) for a chat request."""
+        if not self._semantic_cache_available():
+            return None, None
+        try:
+            return await self._run_io(self._lookup_semantic_cache_sync, request)
+        except Exception as e:
+            self._semantic_cache_failed("lookup", e)
+            return None, None
+
+    async def store_semantic_cache(self, request: ChatRequest, vector: Optional[List[float]], response: ChatResponse):
+        """Store a generated answer in the semantic cache (run after the response is sent)."""
+        if vector is None or not self._semantic_cache_available():
+            return
+        point = PointStruct(
+            id=str(uuid.uuid4()),
+            vector=vector,
+            payload={
+                "query": request.message,
+                "partition": self._semantic_cache_partition(request),
+                "created_at": time.time(),
+                "response": response.model_dump()
+            }
+        )
+        try:
+            client = self._init_qdrant()
+            if client:
+                await self._run_io(self._store_semantic_cache_sync, client, point)
+        except Exception as e:
+            self._semantic_cache_failed("store", e)
+
+    def _store_semantic_cache_sync(self, client: QdrantClient, point: PointStruct):
+        """Upsert a cached answer, keeping the collection within its size bound."""
+        client.upsert(collection_name=self.semantic_cache_collection, points=[point])
+        if client.count(self.semantic_cache_collection, exact=False).count <= self.semantic_cache_max_entries:
+            return
+        # Over the bound: drop expired answers first, then everything if still too large
+        client.delete(
+            collection_name=self.semantic_cache_collection,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="created_at", range=Range(lt=time.time() - self.semantic_cache_ttl))
+            ]))
+        )
+        if client.count(self.semantic_cache_collection, exact=True).count > self.semantic_cache_max_entries:
+            client.delete_collection(self.semantic_cache_collection)
+            self._semantic_cache_ready = False
+
+    async def clear_semantic_cache(self):
+        """Drop every cached answer from the semantic cache."""
+        if not self.qdrant_client or not self._qdrant_configured():
+            return
+        try:
+            await self._run_io(self.qdrant_client.delete_collection, self.semantic_cache_collection)
+        except Exception:
+            pass  # Collection might not exist
+        self._semantic_cache_ready = False
+
+    def _process_pdf_content(self, file_path: str, filename: str) -> List:
+        """Process PDF file stored on disk and add source metadata."""
+        try:
+            loader = PyPDFLoader(file_path)
             documents = loader.load()
             # Add source metadata
             for doc in documents:
                 doc.metadata.update({
                     "source_type": "pdf",
-                    "file_name": file.filename,
+                    "file_name": filename,
                     "timestamp": datetime.now().isoformat()
                 })
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            # Clean up temp file
-            os.unlink(temp_path)
-            return text_splitter.split_documents(documents)
+            return self._PDF_SPLITTER.split_documents(documents)
         except Exception as e:
             raise Exception(f"PDF processing error: {str(e)}")
 
@@ -348,6 +918,7 @@ class RAGService:
             
             if cache_key in self.url_cache and self._is_cache_valid(self.url_cache[cache_key]):
                 print(f"Using cached content for {url}")
+                self.url_cache.move_to_end(cache_key)
                 cached_entry = self.url_cache[cache_key]
                 
                 # Recreate documents from cached data
@@ -372,34 +943,40 @@ class RAGService:
             
             try:
                 # Fetch content asynchronously
-                content = await self._fetch_url_content_async(url)
+                async with self._fetch_sem:
+                    content = await self._fetch_url_content_async(url)
                 
                 # Create document with metadata
                 from langchain.schema import Document
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        "source_type": "url",
-                        "url": url,
-                        "timestamp": datetime.now().isoformat(),
-                        "content_length": len(content)
-                    }
-                )
-                
-                # Split into chunks (this is CPU-intensive, could be background task)
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1200,
-                    chunk_overlap=200,
-                    separators=["\n\n", "\n", ". ", " ", ""]
-                )
+                metadata = {
+                    "source_type": "url",
+                    "url": url,
+                    "timestamp": datetime.now().isoformat(),
+                    "content_length": len(content)
+                }
                 
-                chunks = text_splitter.split_documents([doc])
+                # Same text already split for another URL (mirror, trailing slash...)
+                content_hash = hashlib.sha256(content.encode()).hexdigest()
+                if content_hash in self.content_cache:
+                    print(f"Reusing chunks of identical content for {url}")
+                    self.content_cache.move_to_end(content_hash)
+                    chunks = [
+                        Document(page_content=chunk_text, metadata=dict(metadata))
+                        for chunk_text in self.content_cache[content_hash]
+                    ]
+                else:
+                    # Split into chunks (this is CPU-intensive, could be background task)
+                    doc = Document(page_content=content, metadata=metadata)
+                    chunks = self._WEB_SPLITTER.split_documents([doc])
+                    self.content_cache[content_hash] = [chunk.page_content for chunk in chunks]
+                    while len(self.content_cache) > self.max_cache_size:
+                        self.content_cache.popitem(last=False)
                 
                 # Cache the results
-                self._cleanup_cache()
+                expires_at = time.time() + self.cache_expiry_hours * 3600
                 self.url_cache[cache_key] = {
                     'url': url,
-                    'timestamp': datetime.now().isoformat(),
+                    'expires_at': expires_at,
                     'chunks': [
                         {
                             'content': chunk.page_content,
@@ -408,6 +985,9 @@ class RAGService:
                         for chunk in chunks
                     ]
                 }
+                self.url_cache.move_to_end(cache_key)
+                heapq.heappush(self._url_cache_expiry, (expires_at, cache_key))
+                self._cleanup_cache()
                 
                 # Complete the future
                 future.set_result(chunks)
@@ -473,12 +1053,11 @@ class RAGService:
                 }
                 resp = requests.get(url, headers=headers, timeout=20)
                 resp.raise_for_status()
-                soup = bs4.BeautifulSoup(resp.content, 'html.parser')
+                soup = bs4.BeautifulSoup(resp.content, 'lxml', parse_only=_BODY_STRAINER)
                 for script in soup(["script", "style", "noscript"]):
                     script.decompose()
                 text = soup.get_text("\n")
-                lines = [ln.strip() for ln in text.splitlines()]
-                content = "\n".join([ln for ln in lines if ln])
+                content = _LINE_BREAKS_RE.sub("\n", text).strip()
 
             if not content or len(content.strip()) < 10:
                 raise Exception("No meaningful text content found")
@@ -493,11 +1072,7 @@ class RAGService:
                 }
             )
 
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1200,
-                chunk_overlap=200
-            )
-            return text_splitter.split_documents([doc])
+            return self._WEB_SPLITTER.split_documents([doc])
 
         except Exception as e:
             raise Exception(f"Web processing error: {str(e)}")
@@ -524,59 +1099,13 @@ class RAGService:
         return Agent(
             name="Professeur Virtuel",
             model=Ollama(id=self.config['model_version']),
-            instructions="""You are "Professeur Virtuel" - an AI assistant for researchers, PhD students, engineers, R&D teams, and enterprise management services.
-
-            ABSOLUTE CRITICAL RULE: Your response must contain ONLY the final answer to the user's question. You must NEVER include:
-            - Any analysis, reasoning, or thinking process
-            - Phrases like "Let me analyze", "Based on my analysis", "I need to", "Let's", "I'll"
-            - Meta-commentary about your approach or process
-            - Planning steps or internal thoughts
-            - System-level explanations or reasoning
-            - Words like "analysis", "reasoning", "thinking", "planning" followed by your thought process
-
-            WRONG EXAMPLES (NEVER do this):
-            - "analysisWe need to give a structured answer... Ok proceed."
-            - "Let me analyze this question first..."
-            - "Based on my analysis of the context..."
-            - "I need to examine the documents..."
-
-            RIGHT APPROACH: Start immediately with your substantive answer to the user's question.
-
-            Your mission is to provide **structured**, **clear**, and **rigorous** answers while adapting your tone to your audience:
-            - **Academic tone** for researchers and PhD students
-            - **Technical tone** for engineers and R&D teams  
-            - **Strategic tone** for enterprise management
-
-            ## Core Principles:
-            1. **Structure & Clarity**: Use formatting effectively
-               - **Bold** for key terms and concepts
-               - Bullet points for lists and options
-               - Numbered lists for step-by-step processes
-               - Tables when comparing data or options
-            
-            2. **Source Attribution**: When using provided context
-               - **Cite the source document or filename** when available
-               - Reference specific sections when possible
-               - Distinguish between document-based and general knowledge
-            
-            3. **Clean Output**: 
-               - Provide direct, user-facing answers
-               - No meta-commentary about your process
-               - No analysis explanations unless explicitly requested
-               - Professional and polished responses only
-            
-            ## Response Guidelines:
-            - When given **context from documents**: Focus on the provided information, cite sources
-            - When given **web search results**: Synthesize information and list sources at the end
-            - When using **general knowledge**: Be clear about the knowledge source
-            - Always maintain **professional clarity** and **directness**
-            """,
+            instructions=_SYSTEM_PROMPT,
             show_tool_calls=True,
             markdown=True,
         )
 
-    def _openrouter_chat(self, prompt: str) -> str:
-        """Call OpenRouter API for chat completion with selected model."""
+    def _openrouter_request(self, prompt: str, stream: bool = False):
+        """Build OpenRouter chat completion URL, headers and payload."""
         api_key = self.config.get('openrouter_api_key')
         model = self.config.get('openrouter_model')
         if not api_key or not model:
@@ -588,287 +1117,314 @@ class RAGService:
             "HTTP-Referer": "http://localhost:3000",
             "X-Title": "DeepSeek RAG App"
         }
-        
-        # Define the Professeur Virtuel system prompt
-        system_prompt = """You are "Professeur Virtuel" - an AI assistant for researchers, PhD students, engineers, R&D teams, and enterprise management services.
-
-ABSOLUTE CRITICAL RULE: Your response must contain ONLY the final answer to the user's question. You must NEVER include:
-- Any analysis, reasoning, or thinking process
-- Phrases like "Let me analyze", "Based on my analysis", "I need to", "Let's", "I'll"
-- Meta-commentary about your approach or process
-- Planning steps or internal thoughts
-- System-level explanations or reasoning
-- Words like "analysis", "reasoning", "thinking", "planning" followed by your thought process
-
-WRONG EXAMPLES (NEVER do this):
-- "analysisWe need to give a structured answer... Ok proceed."
-- "Let me analyze this question first..."
-- "Based on my analysis of the context..."
-- "I need to examine the documents..."
-
-RIGHT APPROACH: Start immediately with your substantive answer to the user's question.
-
-Your mission is to provide **structured**, **clear**, and **rigorous** answers while adapting your tone to your audience:
-- **Academic tone** for researchers and PhD students
-- **Technical tone** for engineers and R&D teams  
-- **Strategic tone** for enterprise management
-
-## Core Principles:
-1. **Structure & Clarity**: Use formatting effectively
-   - **Bold** for key terms and concepts
-   - Bullet points for lists and options
-   - Numbered lists for step-by-step processes
-   - Tables when comparing data or options
-
-2. **Source Attribution**: When using provided context
-   - **Cite the source document or filename** when available
-   - Reference specific sections when possible
-   - Distinguish between document-based and general knowledge
-
-3. **Clean Output**: 
-   - Provide direct, user-facing answers
-   - No meta-commentary about your process
-   - No analysis explanations unless explicitly requested
-   - Professional and polished responses only
-
-## Response Guidelines:
-- When given **context from documents**: Focus on the provided information, cite sources
-- When given **web search results**: Synthesize information and list sources at the end
-- When using **general knowledge**: Be clear about the knowledge source
-- Always maintain **professional clarity** and **directness**"""
 
         payload = {
             "model": model,
             "messages": [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            "stream": stream
         }
-        resp = requests.post(url, json=payload, headers=headers, timeout=60)
-        if resp.status_code != 200:
-            raise Exception(f"OpenRouter error: {resp.status_code} {resp.text}")
-        data = resp.json()
-        try:
-            return data["choices"][0]["message"]["content"]
-        except Exception:
-            raise Exception("Invalid response from OpenRouter")
+        return url, headers, payload
 
-    def _ollama_chat(self, prompt: str, model: str) -> str:
-        """Call Ollama API for chat completion with selected model."""
-        try:
-            import requests
-            
-            # Ollama API endpoint (default local installation)
-            url = "http://localhost:11434/api/generate"
-            
-            # Define the Professeur Virtuel system prompt
-            system_prompt = """You are "Professeur Virtuel" - an AI assistant for researchers, PhD students, engineers, R&D teams, and enterprise management services.
+    async def _openrouter_chat(self, prompt: str) -> str:
+        """Call OpenRouter API for chat completion with selected model.
 
-ABSOLUTE CRITICAL RULE: Your response must contain ONLY the final answer to the user's question. You must NEVER include:
-- Any analysis, reasoning, or thinking process
-- Phrases like "Let me analyze", "Based on my analysis", "I need to", "Let's", "I'll"
-- Meta-commentary about your approach or process
-- Planning steps or internal thoughts
-- System-level explanations or reasoning
-- Words like "analysis", "reasoning", "thinking", "planning" followed by your thought process
+        The answer is accumulated from the token stream: the read timeout then
+        applies between tokens instead of to the whole generation.
+        """
+        return "".join([delta async for delta in self._openrouter_chat_stream(prompt)])
 
-WRONG EXAMPLES (NEVER do this):
-- "analysisWe need to give a structured answer... Ok proceed."
-- "Let me analyze this question first..."
-- "Based on my analysis of the context..."
-- "I need to examine the documents..."
+    def _ollama_request(self, prompt: str, model: str, stream: bool = False):
+        """Build Ollama generate URL and payload with the system prompt."""
+        # Ollama API endpoint (default local installation)
+        url = f"{self.ollama_base_url}/api/generate"
 
-RIGHT APPROACH: Start immediately with your substantive answer to the user's question.
+        # Combine system prompt with user prompt
+        full_prompt = f"{_SYSTEM_PROMPT}\n\nUser: {prompt}\n\nAssistant:"
 
-Your mission is to provide **structured**, **clear**, and **rigorous** answers while adapting your tone to your audience:
-- **Academic tone** for researchers and PhD students
-- **Technical tone** for engineers and R&D teams  
-- **Strategic tone** for enterprise management
+        payload = {
+            "model": model,
+            "prompt": full_prompt,
+            "stream": stream
+        }
+        return url, payload
 
-## Core Principles:
-1. **Structure & Clarity**: Use formatting effectively
-   - **Bold** for key terms and concepts
-   - Bullet points for lists and options
-   - Numbered lists for step-by-step processes
-   - Tables when comparing data or options
+    async def _ollama_chat(self, prompt: str, model: str) -> str:
+        """Call Ollama API for chat completion with selected model.
 
-2. **Source Attribution**: When using provided context
-   - **Cite the source document or filename** when available
-   - Reference specific sections when possible
-   - Distinguish between document-based and general knowledge
+        The answer is accumulated from the token stream: the read timeout then
+        applies between tokens instead of to the whole generation.
+        """
+        return "".join([token async for token in self._ollama_chat_stream(prompt, model)])
 
-3. **Clean Output**: 
-   - Provide direct, user-facing answers
-   - No meta-commentary about your process
-   - No analysis explanations unless explicitly requested
-   - Professional and polished responses only
+    def _search_with_scores(self, query: str, threshold: float, k: int = 5,
+                            vector: Optional[List[float]] = None):
+        """Similarity search returning (document, score) pairs above the threshold.
 
-## Response Guidelines:
-- When given **context from documents**: Focus on the provided information, cite sources
-- When given **web search results**: Synthesize information and list sources at the end
-- When using **general knowledge**: Be clear about the knowledge source
-- Always maintain **professional clarity** and **directness**"""
+        An already computed query embedding is reused instead of embedding again.
+        """
+        if vector is None:
+            vector = self.query_embeddings.embed_query(query)
+        return self.vector_store.similarity_search_with_score_by_vector(
+            vector,
+            k=k,
+            score_threshold=threshold,
+            # Search quantized vectors, then rescore candidates with originals
+            search_params=SearchParams(
+                quantization=QuantizationSearchParams(
+                    ignore=False,
+                    rescore=True,
+                    oversampling=2.0
+                )
+            )
+        )
+
+    async def _retrieve_docs_async(self, query: str, threshold: float,
+                                   vector: Optional[List[float]] = None):
+        """Retrieve (document, score) pairs off the event loop, using the query cache."""
+        cache_key = self._get_query_cache_key(query, threshold, 5)
+        scored_docs = self.query_cache.get(cache_key)
+        if scored_docs is None:
+            scored_docs = await self._run_io(self._search_with_scores, query, threshold, 5, vector)
+            self.query_cache.put(cache_key, scored_docs)
+        return scored_docs
+
+    async def _get_ddg_client(self) -> httpx.AsyncClient:
+        """Get or create the DuckDuckGo HTTP client."""
+        if self._ddg_client is None:
+            self._ddg_client = httpx.AsyncClient(
+                base_url="https://html.duckduckgo.com",
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(max_keepalive_connections=5),
+                http2=HTTP2_AVAILABLE,
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                }
+            )
+        return self._ddg_client
+
+    async def _web_search_async(self, query: str, max_results: int = 5):
+        """Search DuckDuckGo's HTML endpoint on a kept-alive connection.
 
-            # Combine system prompt with user prompt
-            full_prompt = f"{system_prompt}\n\nUser: {prompt}\n\nAssistant:"
+        Falls back to the DDGS client in a worker thread when the page cannot
+        be fetched or parsed (e.g. DuckDuckGo answering with a bot challenge).
+        """
+        try:
+            client = await self._get_ddg_client()
+            response = await client.post("/html/", data={"q": query, "kl": "wt-wt"})
+            response.raise_for_status()
+            results = _parse_ddg_html(response.content, max_results)
+            if results:
+                return results
+        except Exception as e:
+            print(f"DuckDuckGo HTML search failed, falling back to DDGS: {e}")
+        return await asyncio.to_thread(self._duckduckgo_search, query, max_results)
+
+    @staticmethod
+    def _source_line(source: Dict[str, Any]) -> str:
+        """Format one source as a citation line for the prompt."""
+        if source["type"] == "pdf":
+            return f"- Document: **{source['name']}** (PDF)"
+        if source["type"] in ("url", "web_search"):
+            title = source.get('title', source['name'])
+            return f"- Web source: **{title}** ({source['name']})"
+        return f"- Source: **{source['name']}** ({source['type']})"
+
+    def _document_context(self, docs: List, request: ChatRequest):
+        """Build context, deduplicated sources and prompt citations from retrieved chunks.
+
+        Returns:
+            tuple: (context, sources, source_lines)
+        """
+        context = "\n\n".join([d.page_content for d in docs])
+        sources = []
+        source_lines = []
+        # Format sources with deduplication; prompt citations are built in the same pass
+        seen_sources = set()
+        for doc in docs:
+            source_type = doc.metadata.get("source_type", "unknown")
+            source_name = doc.metadata.get("file_name" if source_type == "pdf" else "url", "unknown")
             
-            payload = {
-                "model": model,
-                "prompt": full_prompt,
-                "stream": False
+            # Only add unique sources
+            if source_name in seen_sources:
+                continue
+            seen_sources.add(source_name)
+            source = {
+                "id": len(sources) + 1,
+                "type": source_type,
+                "name": source_name,
+                "content": _preview(doc.page_content) if request.include_previews else ""
             }
-            
-            response = requests.post(url, json=payload, timeout=60)
-            
-            if response.status_code != 200:
-                raise Exception(f"Ollama error: {response.status_code} {response.text}")
-            
-            data = response.json()
-            return data.get("response", "")
-            
-        except requests.exceptions.ConnectionError:
-            raise Exception("Could not connect to Ollama. Please ensure Ollama is running on localhost:11434")
-        except requests.exceptions.Timeout:
-            raise Exception("Ollama request timed out")
-        except Exception as e:
-            raise Exception(f"Ollama error: {str(e)}")
+            sources.append(source)
+            source_lines.append(self._source_line(source))
+        return context, sources, source_lines
 
-    async def process_chat(self, request: ChatRequest) -> ChatResponse:
-        """Process chat request with RAG or simple mode"""
-        try:
-            # Update config from request
-            self.config['similarity_threshold'] = request.similarity_threshold
-            self.config['use_web_search'] = request.use_web_search
-            self.config['model_version'] = request.model_version
-            if hasattr(request, 'openrouter_model') and request.openrouter_model is not None:
-                self.config['openrouter_model'] = request.openrouter_model or None
-            if hasattr(request, 'ollama_model') and request.ollama_model is not None:
-                self.config['ollama_model'] = request.ollama_model or None
-            if hasattr(request, 'provider') and request.provider is not None:
-                self.config['provider'] = request.provider
-
-            context = ""
-            docs = []
-            sources = []
-            search_type = "none"
-            thinking_process = None
-
-            if request.rag_enabled and not request.force_web_search and self.vector_store:
-                # Try document search first
-                retriever = self.vector_store.as_retriever(
-                    search_type="similarity_score_threshold",
-                    search_kwargs={
-                        "k": 5,
-                        "score_threshold": request.similarity_threshold
-                    }
-                )
-                docs = retriever.invoke(request.message)
-                if docs:
-                    context = "\n\n".join([d.page_content for d in docs])
-                    search_type = "document"
-                    # Format sources with deduplication
-                    unique_sources = {}  # Use dict to deduplicate by source name
-                    for doc in docs:
-                        source_type = doc.metadata.get("source_type", "unknown")
-                        source_name = doc.metadata.get("file_name" if source_type == "pdf" else "url", "unknown")
-                        
-                        # Only add unique sources
-                        if source_name not in unique_sources:
-                            unique_sources[source_name] = {
-                                "type": source_type,
-                                "name": source_name,
-                                "content": doc.page_content[:200] + "..."
-                            }
-                    
-                    # Convert to list with sequential IDs
-                    sources = [
-                        {"id": i+1, **source_data} 
-                        for i, source_data in enumerate(unique_sources.values())
-                    ]
+    async def _gather_context(self, request: ChatRequest, query_vector: Optional[List[float]] = None):
+        """Search documents and/or the web for a request.
 
-            # Use DuckDuckGo web search if forced or no relevant documents found
-            if (request.force_web_search or not context) and request.use_web_search:
-                try:
-                    web_results = self._duckduckgo_search(request.message, max_results=5)
-                    if web_results:
-                        search_type = "web"
-                        # Build context from results
-                        context_lines = []
-                        unique_web_sources = {}  # Deduplicate web sources too
-                        
-                        for i, r in enumerate(web_results, 1):
-                            title = r["title"] or "Untitled"
-                            url = r["href"]
-                            snippet = r["body"] or ""
-                            context_lines.append(f"[{i}] {title} - {url}\n{snippet}")
-                            
-                            # Add to unique sources
-                            if url not in unique_web_sources:
-                                unique_web_sources[url] = {
-                                    "type": "web_search",
-                                    "name": url,
-                                    "title": title,
-                                    "content": (title + " - " + snippet)[:200] + "..."
-                                }
-                        
-                        context = "Web Search Results:\n" + "\n\n".join(context_lines)
-                        
-                        # Build deduplicated sources for UI
-                        sources = [
-                            {"id": i+1, **source_data} 
-                            for i, source_data in enumerate(unique_web_sources.values())
-                        ]
-                except Exception as e:
-                    raise Exception(f"Web search error: {str(e)}")
+        Returns:
+            tuple: (context, sources, source_info, search_type)
+        """
+        context = ""
+        docs = []
+        sources = []
+        source_lines = []  # Citation lines for the prompt, one per source
+        weak_docs = []  # Low-confidence matches, used if the web yields nothing
+        search_type = "none"
+
+        search_docs = request.rag_enabled and not request.force_web_search and self.vector_store
+        # Web search runs alongside document retrieval so the fallback path
+        # does not pay vector search and web search latency in series
+        web_task = (
+            asyncio.create_task(self._web_search_async(request.message))
+            if request.use_web_search else None
+        )
+        if web_task:
+            # Mark the exception as retrieved when the result ends up unused
+            web_task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
-            # Build final prompt
-            if context:
-                # Build source information for better citation
-                source_info = ""
-                if sources:
-                    source_list = []
-                    for source in sources:
-                        if source["type"] == "pdf":
-                            source_list.append(f"- Document: **{source['name']}** (PDF)")
-                        elif source["type"] in ["url", "web_search"]:
-                            title = source.get('title', source['name'])
-                            source_list.append(f"- Web source: **{title}** ({source['name']})")
-                        else:
-                            source_list.append(f"- Source: **{source['name']}** ({source['type']})")
-                    source_info = f"\n\n**Available Sources:**\n" + "\n".join(source_list)
+        if search_docs:
+            # Try document search first
+            try:
+                scored_docs = await self._retrieve_docs_async(
+                    request.message, request.similarity_threshold, query_vector
+                )
+            except Exception:
+                if web_task:
+                    web_task.cancel()
+                raise
+            top_score = max((score for _, score in scored_docs), default=0.0)
+            if web_task and top_score >= self.config['high_confidence_score']:
+                # Strong document match: the web fallback will not be needed
+                web_task.cancel()
+                web_task = None
+            elif scored_docs and request.use_web_search and top_score < self.config['low_confidence_score']:
+                # Weak matches only: prefer the web results, keep these as a fallback
+                weak_docs = [doc for doc, _ in scored_docs]
+                scored_docs = []
+            docs = [doc for doc, _ in scored_docs]
+            if docs:
+                context, sources, source_lines = self._document_context(docs, request)
+                search_type = "document"
+
+        # Use DuckDuckGo web search if forced or no relevant documents found
+        if (request.force_web_search or not context) and request.use_web_search:
+            try:
+                web_results = await web_task
+            except Exception as e:
+                if not weak_docs:
+                    raise Exception(f"Web search error: {str(e)}")
+                print(f"Web search failed, answering from weaker document matches: {e}")
+                web_results = []
+            if web_results:
+                search_type = "web"
+                # Build context, deduplicated sources and citations in one pass
+                context_lines = []
+                sources = []
+                source_lines = []
+                seen_urls = set()
                 
-                if search_type == "web":
-                    prompt_instruction = "Based on the web search results above, provide a comprehensive answer and include a 'Sources:' section at the end listing the websites used."
-                else:
-                    prompt_instruction = "Based on the provided documents, answer the question and cite the source document names when referencing specific information."
+                for i, r in enumerate(web_results, 1):
+                    title = r["title"] or "Untitled"
+                    url = r["href"]
+                    snippet = r["body"] or ""
+                    context_lines.append(f"[{i}] {title} - {url}\n{snippet}")
+                    
+                    # Add to unique sources
+                    if url in seen_urls:
+                        continue
+                    seen_urls.add(url)
+                    source = {
+                        "id": len(sources) + 1,
+                        "type": "web_search",
+                        "name": url,
+                        "title": title,
+                        "content": _preview(f"{title} - {snippet}") if request.include_previews else ""
+                    }
+                    sources.append(source)
+                    source_lines.append(self._source_line(source))
                 
-                full_prompt = f"""Context: {context}{source_info}
-
-Original Question: {request.message}
-
-{prompt_instruction}"""
+                context = "Web Search Results:\n" + "\n\n".join(context_lines)
+            elif weak_docs:
+                # No web results: the weaker document matches beat no context at all
+                context, sources, source_lines = self._document_context(weak_docs, request)
+                search_type = "document"
+        elif web_task:
+            # Documents answered the question: drop the speculative web search
+            web_task.cancel()
+
+        source_info = "\n\n**Available Sources:**\n" + "\n".join(source_lines) if source_lines else ""
+        return context, sources, source_info, search_type
+
+    async def _prepare_chat(self, request: ChatRequest, query_vector: Optional[List[float]] = None):
+        """Apply request settings, gather context and build the final prompt.
+
+        Returns:
+            tuple: (full_prompt, sources, search_type)
+        """
+        # Update config from request
+        self.config['similarity_threshold'] = request.similarity_threshold
+        self.config['use_web_search'] = request.use_web_search
+        self.config['model_version'] = request.model_version
+        if hasattr(request, 'openrouter_model') and request.openrouter_model is not None:
+            self.config['openrouter_model'] = request.openrouter_model or None
+        if hasattr(request, 'ollama_model') and request.ollama_model is not None:
+            self.config['ollama_model'] = request.ollama_model or None
+        if hasattr(request, 'provider') and request.provider is not None:
+            self.config['provider'] = request.provider
+
+        # Retrieval and web search results are reused for repeated questions
+        context_key = self._get_context_cache_key(request)
+        gathered = self.context_cache.get(context_key)
+        if gathered is None:
+            gathered = await self._gather_context(request, query_vector)
+            self.context_cache.put(context_key, gathered)
+        context, sources, source_info, search_type = gathered
+
+        # Build final prompt
+        if context:
+            if search_type == "web":
+                prompt_instruction = "Based on the web search results above, provide a comprehensive answer and include a 'Sources:' section at the end listing the websites used."
             else:
-                full_prompt = request.message
-
-            # Route based on provider configuration
-            provider = self.config.get('provider', 'ollama')
+                prompt_instruction = "Based on the provided documents, answer the question and cite the source document names when referencing specific information."
             
-            if provider == 'openrouter' and self.config.get('openrouter_model') and self.config.get('openrouter_api_key'):
-                response_content = self._openrouter_chat(full_prompt)
-            elif provider == 'ollama':
-                # Use Ollama with specific model if configured, otherwise use default agent
-                ollama_model = self.config.get('ollama_model')
-                if ollama_model:
-                    response_content = self._ollama_chat(full_prompt, ollama_model)
-                else:
-                    rag_agent = self._get_rag_agent()
-                    response = rag_agent.run(full_prompt)
-                    response_content = response.content
-            else:
-                # Fallback to default agent
-                rag_agent = self._get_rag_agent()
-                response = rag_agent.run(full_prompt)
-                response_content = response.content
+            # Single join over the parts: the (possibly large) context is copied once
+            full_prompt = "".join((
+                "Context: ", context, source_info,
+                "\n\nOriginal Question: ", request.message,
+                "\n\n", prompt_instruction
+            ))
+        else:
+            full_prompt = request.message
+
+        return full_prompt, sources, search_type
+
+    def _run_rag_agent(self, full_prompt: str) -> str:
+        """Run the default agno agent (blocking)."""
+        rag_agent = self._get_rag_agent()
+        return rag_agent.run(full_prompt).content
+
+    async def _generate(self, full_prompt: str) -> str:
+        """Route the prompt to the configured provider and return the raw answer."""
+        provider = self.config.get('provider', 'ollama')
+
+        if provider == 'openrouter' and self.config.get('openrouter_model') and self.config.get('openrouter_api_key'):
+            return await self._openrouter_chat(full_prompt)
+        elif provider == 'ollama':
+            # Use Ollama with specific model if configured, otherwise use default agent
+            ollama_model = self.config.get('ollama_model')
+            if ollama_model:
+                return await self._ollama_chat(full_prompt, ollama_model)
+        # Default agent: the agno client is synchronous, keep it off the event loop
+        return await asyncio.to_thread(self._run_rag_agent, full_prompt)
+
+    async def process_chat(self, request: ChatRequest, query_vector: Optional[List[float]] = None) -> ChatResponse:
+        """Process chat request with RAG or simple mode"""
+        try:
+            full_prompt, sources, search_type = await self._prepare_chat(request, query_vector)
+            response_content = await self._generate(full_prompt)
 
             # Clean up any system prompts or unwanted content that might leak through
             final_response = self._clean_response(response_content)
@@ -879,22 +1435,130 @@ Original Question: {request.message}
 
             return ChatResponse(
                 response=final_response,
-                sources=sources if sources else None,
-                thinking_process=None,  # No longer expose thinking process
+                sources=sources,
                 search_type=search_type
             )
 
         except Exception as e:
             raise Exception(f"Error processing chat: {str(e)}")
 
-    async def process_pdf(self, file: UploadFile) -> DocumentResponse:
-        """Process uploaded PDF file"""
+    async def _ollama_chat_stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        """Stream Ollama completion tokens as they are generated."""
+        url, payload = self._ollama_request(prompt, model, stream=True)
+        client = await self._get_http_client()
         try:
-            filename = file.filename
-            if filename in self.processed_documents:
+            async with client.stream(
+                "POST", url, content=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=httpx.Timeout(60.0)
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise Exception(f"Ollama error: {response.status_code} {body.decode(errors='replace')}")
+                produced = False
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = orjson.loads(line)
+                    # Errors raised mid-generation arrive as a 200 stream object
+                    if data.get("error"):
+                        raise Exception(f"Ollama error: {data['error']}")
+                    if data.get("response"):
+                        produced = True
+                        yield data["response"]
+                    if data.get("done"):
+                        break
+                if not produced:
+                    raise Exception("Ollama returned an empty response")
+        except httpx.ConnectError:
+            raise Exception("Could not connect to Ollama. Please ensure Ollama is running on localhost:11434")
+        except httpx.TimeoutException:
+            raise Exception("Ollama request timed out")
+
+    async def _openrouter_chat_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Stream OpenRouter completion tokens from its SSE endpoint."""
+        url, headers, payload = self._openrouter_request(prompt, stream=True)
+        client = await self._get_http_client()
+        async with client.stream(
+            "POST", url, content=orjson.dumps(payload), headers=headers, timeout=httpx.Timeout(60.0)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise Exception(f"OpenRouter error: {response.status_code} {body.decode(errors='replace')}")
+            produced = False
+            async for line in response.aiter_lines():
+                # Skip keep-alive comments and blank separators
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                chunk = orjson.loads(data)
+                # Provider failures after the headers are sent come as an error chunk
+                error = chunk.get("error")
+                if error:
+                    message = error.get("message", error) if isinstance(error, dict) else error
+                    raise Exception(f"OpenRouter error: {message}")
+                choices = chunk.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    produced = True
+                    yield delta
+            if not produced:
+                raise Exception("OpenRouter returned an empty response")
+
+    async def stream_chat(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Process chat request and stream the answer as events.
+
+        Yields {"delta": str} events while the model generates, then a final
+        {"done": True, "response", "sources", "search_type"} event carrying the
+        cleaned full answer.
+        """
+        full_prompt, sources, search_type = await self._prepare_chat(request)
+
+        provider = self.config.get('provider', 'ollama')
+        if provider == 'openrouter' and self.config.get('openrouter_model') and self.config.get('openrouter_api_key'):
+            deltas = self._openrouter_chat_stream(full_prompt)
+        elif provider == 'ollama' and self.config.get('ollama_model'):
+            deltas = self._ollama_chat_stream(full_prompt, self.config['ollama_model'])
+        else:
+            # The default agent does not stream: emit its answer in one piece
+            async def _single():
+                yield await self._generate(full_prompt)
+            deltas = _single()
+
+        parts = []
+        async for delta in deltas:
+            parts.append(delta)
+            yield {"delta": delta}
+
+        final_response = self._clean_response("".join(parts))
+
+        # Add to chat history
+        self.chat_history.append({"role": "user", "content": request.message})
+        self.chat_history.append({"role": "assistant", "content": final_response})
+
+        yield {
+            "done": True,
+            "response": final_response,
+            "sources": sources,
+            "search_type": search_type
+        }
+
+    async def process_pdf(self, file_path: str, filename: str, content_hash: Optional[str] = None) -> DocumentResponse:
+        """Process uploaded PDF file already written to disk"""
+        try:
+            # Same content already indexed (possibly under another name)
+            if content_hash and content_hash in self.seen_pdf_hashes:
+                return DocumentResponse(
+                    message=f"PDF already indexed: {filename}",
+                    filename=filename,
+                    chunks_added=0
+                )
+
+            if filename in self._processed_set:
                 raise Exception(f"Document {filename} already processed")
 
-            texts = self._process_pdf_content(file)
+            # PDF parsing and splitting are CPU-bound: keep them off the event loop
+            texts = await asyncio.to_thread(self._process_pdf_content, file_path, filename)
             if not texts:
                 raise Exception("No text content found in PDF")
 
@@ -902,17 +1566,16 @@ Original Question: {request.message}
             if not client:
                 raise Exception("Qdrant client not initialized")
 
-            if self.vector_store:
-                self.vector_store.add_documents(texts)
-            else:
-                self.vector_store = self._create_vector_store(texts)
+            added = await self._add_documents(texts)
 
-            self.processed_documents.append(filename)
+            self._mark_processed(filename)
+            if content_hash:
+                self.seen_pdf_hashes.add(content_hash)
 
             return DocumentResponse(
                 message=f"Successfully processed PDF: {filename}",
                 filename=filename,
-                chunks_added=len(texts)
+                chunks_added=added
             )
 
         except Exception as e:
@@ -921,7 +1584,7 @@ Original Question: {request.message}
     async def process_url(self, url: str, background_tasks: Optional[BackgroundTasks] = None) -> DocumentResponse:
         """Process web URL with optimization and optional background processing."""
         try:
-            if url in self.processed_documents:
+            if url in self._processed_set:
                 raise Exception(f"URL {url} already processed")
 
             # Use async processing for better performance
@@ -938,7 +1601,7 @@ Original Question: {request.message}
             if len(texts) > 50 and background_tasks:  # Large document threshold
                 background_tasks.add_task(self._add_documents_to_vector_store, texts)
                 # Add to processed list immediately for user feedback
-                self.processed_documents.append(url)
+                self._mark_processed(url)
                 
                 return DocumentResponse(
                     message=f"Successfully queued URL for processing: {url} ({len(texts)} chunks)",
@@ -947,30 +1610,27 @@ Original Question: {request.message}
                 )
             else:
                 # Process immediately for smaller documents
-                if self.vector_store:
-                    self.vector_store.add_documents(texts)
-                else:
-                    self.vector_store = self._create_vector_store(texts)
+                added = await self._add_documents(texts)
 
-                self.processed_documents.append(url)
+                self._mark_processed(url)
 
                 return DocumentResponse(
                     message=f"Successfully processed URL: {url}",
                     filename=url,
-                    chunks_added=len(texts)
+                    chunks_added=added
                 )
 
         except Exception as e:
             raise Exception(f"Error processing URL: {str(e)}")
 
-    def _add_documents_to_vector_store(self, texts: List):
+    async def _add_documents_to_vector_store(self, texts: List):
         """Background task to add documents to vector store."""
         try:
-            if self.vector_store:
-                self.vector_store.add_documents(texts)
-            else:
-                self.vector_store = self._create_vector_store(texts)
-            print(f"Background task completed: Added {len(texts)} chunks to vector store")
+            added = await self._add_documents(texts)
+            # Answers cached while these chunks were being indexed are stale
+            if added and self.on_documents_indexed:
+                await self.on_documents_indexed()
+            print(f"Background task completed: Added {added} chunks to vector store")
         except Exception as e:
             print(f"Background task failed: {str(e)}")
 
@@ -978,7 +1638,7 @@ Original Question: {request.message}
         """Process multiple URLs concurrently."""
         try:
             # Process URLs concurrently with limited concurrency
-            semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent downloads
+            semaphore = asyncio.Semaphore(self.url_batch_concurrency)
             
             async def process_single_url(url: str) -> DocumentResponse:
                 async with semaphore:
@@ -1008,6 +1668,8 @@ Original Question: {request.message}
         """Clear the URL cache."""
         cache_size = len(self.url_cache)
         self.url_cache.clear()
+        self._url_cache_expiry.clear()
+        self.content_cache.clear()
         return {"message": f"Cleared {cache_size} cached URLs"}
 
     async def get_cache_stats(self) -> dict:
@@ -1018,33 +1680,34 @@ Original Question: {request.message}
             "valid_cached_urls": valid_entries,
             "cache_hit_rate": "Available after first requests",
             "max_cache_size": self.max_cache_size,
-            "cache_expiry_hours": self.cache_expiry_hours
+            "cache_expiry_hours": self.cache_expiry_hours,
+            "query_cache": self.query_cache.stats(),
+            "context_cache": self.context_cache.stats()
         }
 
     async def get_status(self) -> StatusResponse:
         """Get service status"""
-        # Check Ollama
-        ollama_status = "unknown"
-        model_available = False
-        try:
-            agent = Agent(model=Ollama(id="llama3.2"))
-            # Try a simple test
-            ollama_status = "connected"
-            model_available = True
-        except Exception:
-            ollama_status = "disconnected"
+        # Probe results are reused for a few seconds: dashboards poll this endpoint
+        ollama_status = self.status_cache.get("ollama")
+        if ollama_status is None:
+            connected = await self.check_ollama_connection(timeout=1.0)
+            ollama_status = "connected" if connected else "disconnected"
+            self.status_cache.put("ollama", ollama_status)
+        model_available = ollama_status == "connected"
 
         # Check Qdrant
-        qdrant_status = "unknown"
-        try:
-            client = self._init_qdrant()
-            if client:
-                client.get_collections()
-                qdrant_status = "connected"
-            else:
-                qdrant_status = "not_configured"
-        except Exception:
-            qdrant_status = "disconnected"
+        qdrant_status = self.status_cache.get("qdrant")
+        if qdrant_status is None:
+            try:
+                client = self._init_qdrant()
+                if client:
+                    await self._run_io(client.get_collections)
+                    qdrant_status = "connected"
+                else:
+                    qdrant_status = "not_configured"
+            except Exception:
+                qdrant_status = "disconnected"
+            self.status_cache.put("qdrant", qdrant_status)
 
         # Web search (DuckDuckGo) is available without API
         web_search_status = "connected"
@@ -1060,133 +1723,54 @@ Original Question: {request.message}
             model_available=model_available
         )
 
+    def _mark_processed(self, name: str):
+        """Record an indexed document or URL."""
+        self._processed_set.add(name)
+        self._processed_deque.append(name)
+
     def get_processed_documents(self) -> List[str]:
         """Get list of processed documents"""
-        return self.processed_documents.copy()
-
-    def clear_documents(self):
-        """Clear all processed documents"""
-        self.processed_documents = []
-        self.vector_store = None
+        return list(self._processed_deque)
 
     def _clean_response(self, response_content: str) -> str:
         """Clean response content to remove unwanted system text or analysis."""
-        # Remove any thinking tags that might leak through
-        response_content = re.sub(r'<think>.*?</think>', '', response_content, flags=re.DOTALL)
-        
-        # CRITICAL: Remove concatenated reasoning patterns that appear in models like gpt-oss-20b
-        # These patterns appear as "wordWORD" without spaces between reasoning and content
-        concatenated_patterns = [
-            r'analysis[A-Z][^.]*?(?:proceed|continue|final|answer|respond)',  # analysisWe need...proceed/final
-            r'reasoning[A-Z][^.]*?(?:proceed|continue|final|answer|respond)', # reasoningLet me...proceed/final
-            r'planning[A-Z][^.]*?(?:proceed|continue|final|answer|respond)',  # planningFirst I...proceed/final
-            r'thinking[A-Z][^.]*?(?:proceed|continue|final|answer|respond)',  # thinkingI should...proceed/final
-            r'assistant[A-Z][^.]*?(?:proceed|continue|final|answer|respond)', # assistantLet me...proceed/final
-            r'system[A-Z][^.]*?(?:proceed|continue|final|answer|respond)',    # systemNow I...proceed/final
-            r'let\'s[A-Z][^.]*?(?:proceed|continue|final|answer|respond)',    # let'sCraft...proceed/final
-        ]
-        
-        for pattern in concatenated_patterns:
-            response_content = re.sub(pattern, '', response_content, flags=re.IGNORECASE | re.DOTALL)
-        
-        # Remove reasoning that starts at the beginning of response (no capital letter)
-        reasoning_start_patterns = [
-            r'^analysis[a-z][^.]*?(?:proceed|continue|final|answer|respond)',
-            r'^reasoning[a-z][^.]*?(?:proceed|continue|final|answer|respond)',
-            r'^planning[a-z][^.]*?(?:proceed|continue|final|answer|respond)',
-            r'^thinking[a-z][^.]*?(?:proceed|continue|final|answer|respond)',
-            r'^assistant[a-z][^.]*?(?:proceed|continue|final|answer|respond)',
-            r'^let\'s[a-z][^.]*?(?:proceed|continue|final|answer|respond)',
-        ]
-        
-        for pattern in reasoning_start_patterns:
-            response_content = re.sub(pattern, '', response_content, flags=re.IGNORECASE | re.DOTALL)
-        
-        # Remove any standalone reasoning words at the start
-        response_content = re.sub(r'^(analysis|reasoning|planning|thinking|assistant|system|let\'s)\s*', '', response_content, flags=re.IGNORECASE)
+        # Remove leaked thinking, reasoning, meta-commentary and role markers in one pass
+        response_content = _CLEANUP_RE.sub('', response_content)
+        response_content = _LEADING_REASONING_RE.sub('', response_content)
         
-        # Remove meta-commentary patterns
-        meta_patterns = [
-            r'I need to.*?\.(?=\s|$)',
-            r'Let me.*?\.(?=\s|$)',
-            r'Let\'s.*?\.(?=\s|$)',
-            r'I\'ll.*?\.(?=\s|$)',
-            r'I will.*?\.(?=\s|$)',
-            r'I should.*?\.(?=\s|$)',
-            r'Based on my analysis.*?\.(?=\s|$)',
-            r'Upon reviewing.*?\.(?=\s|$)',
-            r'According to my analysis.*?\.(?=\s|$)',
-            r'After analyzing.*?\.(?=\s|$)',
-            r'From my analysis.*?\.(?=\s|$)',
-            r'My analysis shows.*?\.(?=\s|$)',
-            r'The analysis indicates.*?\.(?=\s|$)',
-            r'Now I.*?\.(?=\s|$)',
-            r'First, I.*?\.(?=\s|$)',
-            r'To answer this.*?\.(?=\s|$)',
-            r'Looking at.*?\.(?=\s|$)',
-            r'Examining.*?\.(?=\s|$)',
-        ]
-        
-        for pattern in meta_patterns:
-            response_content = re.sub(pattern, '', response_content, flags=re.IGNORECASE)
-        
-        # Remove system role indicators
-        system_indicators = [
-            r'assistant:?\s*',
-            r'system:?\s*',
-            r'ai:?\s*',
-            r'bot:?\s*',
-            r'model:?\s*',
-        ]
-        
-        for pattern in system_indicators:
-            response_content = re.sub(pattern, '', response_content, flags=re.IGNORECASE)
-        
-        # Remove any text that looks like internal commands or thinking
-        internal_commands = [
-            r'ok proceed\.*',
-            r'proceed\.*',
-            r'continue\.*',
-            r'final\.*$',
-            r'answer\.*$',
-            r'respond\.*$',
-        ]
-        
-        for pattern in internal_commands:
-            response_content = re.sub(pattern, '', response_content, flags=re.IGNORECASE)
+        # Clean up extra whitespace and formatting
+        response_content = _LINE_WHITESPACE_RE.sub('', response_content).strip()
         
         # Handle edge case: if response starts with lowercase after cleaning, capitalize first letter
-        response_content = response_content.strip()
         if response_content and response_content[0].islower():
             response_content = response_content[0].upper() + response_content[1:]
         
-        # Clean up extra whitespace and formatting
-        response_content = re.sub(r'\n\s*\n\s*\n+', '\n\n', response_content)  # Multiple newlines to double
-        response_content = re.sub(r'^\s+', '', response_content, flags=re.MULTILINE)  # Remove leading spaces
-        response_content = re.sub(r'\s+$', '', response_content, flags=re.MULTILINE)  # Remove trailing spaces
-        response_content = response_content.strip()
-        
         # Final check: if response is empty or too short after cleaning, return a default message
         if not response_content or len(response_content.strip()) < 10:
-            return "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
+            return FALLBACK_RESPONSE
         
         return response_content
 
     async def cleanup(self):
         """Clean up resources."""
+        await self.embeddings.aclose()
         if self.http_client:
             await self.http_client.aclose()
             self.http_client = None
+        if self._ddg_client:
+            await self._ddg_client.aclose()
+            self._ddg_client = None
+        self._io_executor.shutdown(wait=False)
 
     def clear_chat_history(self):
         """Clear chat history"""
-        self.chat_history = []
+        self.chat_history.clear()
 
     async def delete_conversation_data(self, conversation_id: str):
         """Delete conversation data from memory, cache, and vector store."""
         try:
             # Clear from chat history (if conversation_id matches current session)
-            self.chat_history = []
+            self.chat_history.clear()
             
             # Clear from URL cache if any URLs were processed for this conversation
             # (This would require tracking which URLs belong to which conversation)
@@ -1203,19 +1787,27 @@ Original Question: {request.message}
         except Exception as e:
             raise Exception(f"Error deleting conversation data: {str(e)}")
 
-    def clear_documents(self):
-        """Clear all processed documents and reset vector store"""
-        try:
-            self.processed_documents = []
-            self.vector_store = None
-            self.url_cache.clear()
-            
-            # If we have a Qdrant client, we could also delete the collection
-            if self.qdrant_client:
-                try:
-                    self.qdrant_client.delete_collection(self.collection_name)
-                except Exception:
-                    pass  # Collection might not exist
-                    
-        except Exception as e:
-            print(f"Error clearing documents: {str(e)}")
\ No newline at end of file
+    async def clear_documents(self):
+        """Clear all processed documents and reset vector store.
+
+        The collection is dropped first: local state is only reset once the
+        indexed chunks are gone, so a failed delete leaves both sides in sync.
+        """
+        # Without real Qdrant credentials nothing was ever indexed remotely
+        if self.qdrant_client and self._qdrant_configured():
+            try:
+                await self._run_io(self.qdrant_client.delete_collection, self.collection_name)
+            except Exception as e:
+                if "not found" not in str(e).lower():  # Collection might not exist
+                    raise Exception(f"Error clearing documents: {str(e)}")
+
+        self._processed_set.clear()
+        self._processed_deque.clear()
+        self.seen_pdf_hashes.clear()
+        self._chunk_hashes.clear()
+        self.vector_store = None
+        self.query_cache.clear()
+        self.context_cache.clear()
+        self.url_cache.clear()
+        self._url_cache_expiry.clear()
+        self.content_cache.clear()
@@ -91,7 +91,7 @@ export const documentsAPI = {
    * et de l'indexer dans la base vectorielle RAG.
    */
   addURL: async (url: string): Promise<DocumentResponse> => {
-    const response = await api.post(`/api/add-url?url=${encodeURIComponent(url)}`);
+    const response = await api.post('/api/add-url', { url });
     return response.data;
   },
   